@@ -2,34 +2,67 @@
 Communication and live plotting over USB serial with solutions for
 parallelism and other basic concerns.
 '''
+import os
+import operator
+import collections
 import time
 import tkinter as tk
 from tkinter import ttk, filedialog, simpledialog
+import tkinter.font as tkfont
 import threading
+import queue
 import ast
 import json
 import serial
-import pandas as pd
+import numpy as np
+import matplotlib
+matplotlib.use('TkAgg')  # Agg rendering into Tk; redraws go through canvas.draw_idle so Tk coalesces them
 from matplotlib.figure import Figure
+from matplotlib.collections import LineCollection
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
 plt.style.use('bmh')
+try:
+    import pyarrow as pa  # Optional, enables Feather (Arrow IPC) data files
+except ImportError:
+    pa = None
+
+FRAME_SYNC = b'\xAA\x55'  # Starts a binary data frame, see SimpleDAQ._parse_binary_frame
+RING_CAPACITY = 1 << 18  # Samples kept in memory: must cover the plot window and the rows awaiting the next save
+MAX_PENDING_BYTES = 1 << 16  # Received bytes allowed to wait for a line ending before they are discarded
+MAX_FPS = 30  # Plot repaints per second at most, however short update_delay_seconds is
+LOG_HISTORY = 10_000  # Log entries kept in memory (SimpleDAQ.log)
 
 class SimpleDAQ:
     '''Class implementing serial communication, Tkinter GUI, data processing, and data storage.'''
-    def __init__(self, mc_data_dict, setpoint_dict=None, update_delay_seconds=1, graph_title='', graph_ylabel='Sensor Data', setpoint_decimals=3, setpoint_check_precision=.001):
-        self.log = []
-        self.time_data = []
-        self.start_time = time.time()
+    def __init__(self, mc_data_dict, setpoint_dict=None, update_delay_seconds=1, graph_title='', graph_ylabel='Sensor Data', setpoint_decimals=3, setpoint_check_precision=.001, binary_frames=False):
+        self.log = collections.deque(maxlen=LOG_HISTORY)  # Recent entries only; the log file keeps the full history
+        self._ts_sec, self._ts_str = None, ''  # Cache for _now_str
+        self._log_fh = None
+        # Ring buffers mirrored into two halves, so the latest RING_CAPACITY samples are always a contiguous slice
+        self._n = 0  # Total number of samples received
+        self.time_data = np.empty(2*RING_CAPACITY, dtype=np.float64)
+        self.start_time = time.monotonic()  # Sample times and the save timer use the monotonic clock
         self.mc_data_dict = mc_data_dict
         self.update_delay_seconds = update_delay_seconds
         self.datafilepath, self.logfilepath, self.rawserialpath = None, None, None
-        self.serial_data_packet = ""
-        self.lock = threading.Lock()
+        self._raw_q = queue.Queue(maxsize=1024)  # (run duration, line or decoded frame) tuples read by _read_serial for _parse_lines, None to stop
+        self._rxq = queue.SimpleQueue()  # (run duration, channel values, ESP32 setpoints, log) tuples for _drain
+        self._esp32_setpoints = None  # Setpoints reported in the most recent packet
+        self._n_plotted = None  # (sample count, window size) at the last redraw
+        self._last_paint = float('-inf')  # time.monotonic() of the last redraw
         self.exit_signal = threading.Event()
         self.last_save_time = 0
-        self.serial_connected = False
-        self.data_channels = [[] for k in mc_data_dict.keys()]
+        self._rows_saved = 0  # Samples already appended to the data file
+        self._csv_fh, self._feather_writer = None, None
+        self._save_q = queue.Queue()  # (times, channel values) batches for _write_data, None to stop
+        self._save_error = None  # OSError that stopped _write_data; no further batches are queued
+        self.serial_connected = threading.Event()  # Set by _read_serial; set/clear/is_set need no extra lock
+        self.data_channels = np.empty((len(mc_data_dict), 2*RING_CAPACITY), dtype=np.float64)  # One row per channel, in mc_data_dict order
+        self._get_channels = operator.itemgetter(*mc_data_dict.keys())  # Parsed packet -> channel values in row order
+        self._ch_strkeys = tuple(str(k) for k in mc_data_dict)  # The same keys as they appear in JSON packets
+        self.binary_frames = binary_frames  # Also accept binary data frames interleaved with the ASCII packets
+        self._frame_size = len(FRAME_SYNC) + 4*len(mc_data_dict) + 1
         self.graph_title = graph_title
         self.graph_ylabel = graph_ylabel
         self.window_size = 200  # Default window "size" (number of observations) for the graph
@@ -39,11 +72,18 @@ class SimpleDAQ:
         self.default_COM_port = 'COM6'
         self.default_baud_rate = 115200
         self.toggle_keys = None
+        self._setpoints_dirty = set()  # Names of the setpoint entries edited in the GUI since last parsed
+        self._setpoint_vars = {}  # Keeps the entries' StringVars alive
+        self._setpoint_json = None  # Encoded setpoints for _send_setpoints, rebuilt after edits
         if setpoint_dict:
             self._setpoint_mapping = {k: i for i, k in enumerate(setpoint_dict.keys())}
         else:
             self._setpoint_mapping = {}
             self.setpoints = {}
+        # Numeric copy of the setpoints in mapping order for the vectorized ESP32 check (NaN: string, not checked)
+        self._sp_names = list(self.setpoints)
+        self._sp_strkeys = tuple(str(i) for i in range(len(self._sp_names)))  # Keys of the setpoints reported by the ESP32
+        self._sp_vals = np.array([np.nan if isinstance(v, str) else v for v in self.setpoints.values()], dtype=np.float64)
 
     def start_gui(self):
         self.root = tk.Tk()
@@ -51,7 +91,7 @@ class SimpleDAQ:
         d = COM_Port_Dialogue(self.root, self.default_COM_port, self.default_baud_rate)
         self.port, self.baud_rate = d.result
         self.root.destroy()
-        self.ser = serial.Serial(self.port, self.baud_rate)
+        self.ser = self._open_serial()
         self._define_save_files()
 
         self.root = tk.Tk()
@@ -63,7 +103,9 @@ class SimpleDAQ:
         control_frame.pack_propagate(False)
 
         ttk.Button(control_frame, text="Exit", command=self._exit_program).pack(side=tk.TOP, pady=10)
-        self.status_label = tk.Label(control_frame, text="Status: Connected", bg='lightgrey')
+        self._status_font = tkfont.Font(family="Helvetica", size=12, weight="bold")  # Created once, shared by every status update
+        self._last_status = None
+        self.status_label = tk.Label(control_frame, text="Status: Connected", bg='lightgrey', font=self._status_font)
         self.status_label.pack(side=tk.TOP, pady=10)
 
         # Create a frame for window size label and entry
@@ -83,27 +125,37 @@ class SimpleDAQ:
 
         if self.setpoints:
             self.setpoint_entries = {}
+            self._setpoints_dirty = set(self.setpoints)  # Parse (and round) every entry once
             for name, value in self.setpoints.items():
                 frame = tk.Frame(setpoint_frame)
                 frame.pack(side=tk.TOP, padx=5, pady=5, fill=tk.X, expand=True)
                 tk.Label(frame, text=name).pack(side=tk.LEFT)
-                entry = tk.Entry(frame)
-                entry.insert(0, str(value))
+                var = tk.StringVar(value=str(value))
+                var.trace_add('write', lambda *_, k=name: self._setpoints_dirty.add(k))
+                entry = tk.Entry(frame, textvariable=var)
                 entry.pack(side=tk.RIGHT)
                 self.setpoint_entries[name] = entry
+                self._setpoint_vars[name] = var
         if self.toggle_keys:
             self.create_toggle_buttons(self.toggle_keys)
 
-        self.fig = Figure(figsize=(6, 4), dpi=175)
+        self.fig = Figure(figsize=(6, 4), dpi=100)  # Screen dpi; every blit and redraw scales with pixel count
         self.ax = self.fig.add_subplot(111)
         self.canvas = FigureCanvasTkAgg(self.fig, master=paned_window)
         self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
 
+        self._init_plot()
+
         paned_window.add(self.canvas.get_tk_widget())
 
         if self.datafilepath:
             self.serial_thread = threading.Thread(target=self._read_serial)
             self.serial_thread.start()
+            self.parse_thread = threading.Thread(target=self._parse_lines, daemon=True)
+            self.parse_thread.start()
+            self.save_thread = threading.Thread(target=self._write_data, daemon=True)
+            self.save_thread.start()
+            self.root.after(20, self._drain)
             self.root.after(int(self.update_delay_seconds*1000), self._update)
             self.root.mainloop()
     
@@ -117,6 +169,7 @@ class SimpleDAQ:
             if key in self.setpoint_entries:
                 entry = self.setpoint_entries.pop(key)
                 entry.pack_forget()  # Remove the existing entry widget
+                self._setpoints_dirty.discard(key)  # Toggles set their value directly, see toggle_setpoint
 
                 # Determine toggle button state (text and color)
                 initial_value = self.setpoints.get(key, 0)
@@ -137,181 +190,523 @@ class SimpleDAQ:
         Args:
             key (str): The key of the setpoint to toggle.
         """
-        self.setpoint_entries[key]['value'] = 1 - self.setpoint_entries[key]['value']  # Toggle between 0 and 1
+        value = 1 - self.setpoint_entries[key]['value']  # Toggle between 0 and 1
+        self.setpoint_entries[key]['value'] = value
+        self.setpoints[key] = value
+        self._sp_vals[self._setpoint_mapping[key]] = value
+        self._setpoint_json = None
         button = self.setpoint_entries[key]['button']
         if self.setpoint_entries[key]['value']:
             button.config(bg='#00FF00', text='ON')  # Green background and 'ON' if value = 1
         else:
             button.config(bg='darkgrey', text='OFF')  # Grey background and 'OFF' if value = 0
 
+    def _init_plot(self):
+        '''Styles the axes and creates the legend and the persistent line collection, once. _update only blits new data.'''
+        self.ax.set_title(self.graph_title)
+        self.ax.set_xlabel('Time (s)')
+        self.ax.set_ylabel(self.graph_ylabel)
+        self.ax.minorticks_on()
+        self.ax.grid(True, which='major', color='silver', linewidth=0.375, linestyle='-')
+        self.ax.grid(True, which='minor', color='lightgrey', linewidth=0.2, linestyle='--')
+        handles = [self.ax.plot([], [], label=name)[0] for name in self.mc_data_dict.values()]  # Empty, only style the legend
+        self.ax.legend(fontsize='small')
+        # All channels in one artist: a single draw call per blit regardless of channel count
+        self.line_collection = LineCollection([], colors=[h.get_color() for h in handles], linewidths=handles[0].get_linewidth(), animated=True)
+        self.ax.add_collection(self.line_collection, autolim=False)
+        self.bg = None
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.draw()
+
+    def _on_draw(self, event):
+        '''Re-captures the blit background after every full redraw (first draw, resize, axis rescale).'''
+        self.bg = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line_collection)
+
+    def _append(self, t, values):
+        '''Stores one sample in the ring buffers, overwriting the oldest once RING_CAPACITY samples are held.'''
+        i = self._n % RING_CAPACITY
+        self.time_data[i] = self.time_data[i + RING_CAPACITY] = t
+        self.data_channels[:, i] = self.data_channels[:, i + RING_CAPACITY] = values
+        self._n += 1
+
+    def _window(self, start, stop):
+        '''Returns views of the times and channel values of samples [start, stop), which must be among the last RING_CAPACITY.'''
+        end = stop % RING_CAPACITY + RING_CAPACITY
+        begin = end - (stop - start)
+        return self.time_data[begin:end], self.data_channels[:, begin:end]
+
+    @staticmethod
+    def _downsample(t, y, n_out):
+        """
+        M4 downsampling for plotting: keeps the first, last, min, and max sample of each bucket.
+        Args:
+            t (np.ndarray): Sample times.
+            y (np.ndarray): Sample values.
+            n_out (int): Approximate maximum number of points to return.
+        """
+        n = len(y)
+        if n <= n_out:
+            return t, y
+        size = -(-4*n // n_out)  # Samples per bucket, four points kept per bucket
+        starts = np.arange(0, n, size)
+        full = (n // size) * size
+        blocks = y[:full].reshape(-1, size)
+        idx = [starts, np.minimum(starts + size, n) - 1,
+               starts[:len(blocks)] + blocks.argmin(axis=1), starts[:len(blocks)] + blocks.argmax(axis=1)]
+        if full < n:  # Partial final bucket
+            idx.append([full + y[full:].argmin(), full + y[full:].argmax()])
+        idx = np.unique(np.concatenate(idx))
+        return t[idx], y[idx]
+
     def _define_save_files(self):
-        self.datafilepath = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
-        self.logfilepath = self.datafilepath.replace('.csv', '_log.txt')
-        self.rawserialpath = self.datafilepath.replace('.csv', '_raw_serial.txt')
+        filetypes = [("CSV files", "*.csv")]
+        if pa:
+            filetypes.append(("Feather files", "*.feather"))
+        self.datafilepath = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=filetypes)
+        base_path, extension = os.path.splitext(self.datafilepath)
+        feather_fallback = extension == '.feather' and pa is None
+        if feather_fallback:  # Typed in by hand without pyarrow installed
+            self.datafilepath = base_path + '.csv'
+        self.logfilepath = base_path + '_log.txt'
+        self.rawserialpath = base_path + '_raw_serial.txt'
         if self.datafilepath:
-            self.log.append(f"Program started at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}")
-            with open(self.logfilepath, 'w', encoding='utf8') as f:
-                for entry in self.log:
-                    f.write(f"{entry}\n")
-            self.log.append(f"Data will be saved to {self.datafilepath}")
+            self._log_fh = open(self.logfilepath, 'w', encoding='utf8')  # Kept open; appended by _log_write, flushed by _save_files
+            self._log_write(f"Program started at {self._now_str()}")
+            if feather_fallback:
+                self._log_write("pyarrow is not installed, saving CSV instead of Feather")
+            self._log_write(f"Data will be saved to {self.datafilepath}")
+            self._raw_fh = open(self.rawserialpath, 'ab', buffering=1 << 16)  # Kept open; written by _read_serial
+            columns = ['Time', *self.mc_data_dict.values()]
+            if self.datafilepath.endswith('.feather'):
+                schema = pa.schema([(name, pa.float64()) for name in columns])
+                self._feather_writer = pa.ipc.new_file(self.datafilepath, schema)  # Readable only once closed in _exit_program
+            else:
+                self._csv_fh = open(self.datafilepath, 'w', encoding='utf8', buffering=1 << 20)  # Kept open; appended by _save_files
+                self._csv_fh.write(','.join(columns) + '\n')
+
+    def _log_write(self, entry):
+        '''Records a log entry in memory and appends it to the log file.'''
+        self.log.append(entry)
+        if self._log_fh:
+            self._log_fh.write(f"{entry}\n")
+
+    def _open_serial(self):
+        '''Opens the serial port with a short read timeout so _read_serial can drain it in bulk.'''
+        ser = serial.Serial(self.port, self.baud_rate, timeout=0.05)
+        try:
+            try:
+                ser.set_low_latency_mode(True)  # Linux ASYNC_LOW_LATENCY: ~1 ms instead of the ~16 ms USB latency timer
+            except (AttributeError, NotImplementedError, ValueError):
+                pass  # Not supported by this platform or driver
+            time.sleep(0.5)
+            ser.reset_input_buffer()  # Drop stale bytes buffered by the OS before the port was opened
+        except Exception as err:  # The device dropped again; on POSIX this is a termios.error, which is not an OSError
+            ser.close()  # Don't leak the handle (on Windows it would block every later reopen)
+            raise serial.SerialException(f'Could not set up {self.port}: {err}') from err
+        return ser
 
     def _read_serial(self):
+        '''Reads the serial port in bulk, splitting it into lines and decoded binary frames queued in arrival order for _parse_lines.'''
+        rx_buffer = bytearray()  # Bytes received but not yet split into complete lines/frames
+        last_flush = time.monotonic()
+        raw_error = None  # Last raw-serial file error, reported once until a write succeeds
         while not self.exit_signal.is_set():
             try:
-                ser_data = self.ser.readline().decode('utf-8').strip()
-                if ser_data:
-                    with self.lock:
-                        self.serial_data_packet = ser_data
-                        self.serial_connected = True
-                    with open(self.rawserialpath, "a", encoding='utf8') as f:
-                        f.write(f"{ser_data}\n")
-            except (serial.SerialException, AttributeError):
-                with self.lock:
-                    self.serial_connected = False
-                while not self.serial_connected:
-                    try:
-                        self.ser.close()
-                        self.ser = serial.Serial(self.port, self.baud_rate)
-                        with self.lock:
-                            self.serial_connected = True
-                    except (serial.SerialException, AttributeError):
-                        pass
+                # pyserial's blocking read releases the GIL, so only the splitting below competes with the GUI
+                ser = self.ser
+                rx_buffer.extend(ser.read(ser.in_waiting or 1))
+            except (OSError, AttributeError):  # SerialException is an OSError; a USB hangup can raise a bare OSError (EIO) from in_waiting
+                rx_buffer.clear()
+                self._reconnect()
+                continue
+            raw_lines = []  # Written to the raw-serial file in one call per read
+            dropped = 0  # Lines/frames that found _raw_q full
+            if self.binary_frames:
+                lines = []
+                while True:
+                    i = rx_buffer.find(b'\n')
+                    sync = rx_buffer.find(FRAME_SYNC)
+                    if sync != -1 and (i == -1 or sync < i):
+                        #region Binary data frame
+                        if len(rx_buffer) < sync + self._frame_size:
+                            break  # Wait for the rest of the frame
+                        frame = bytes(rx_buffer[sync:sync + self._frame_size])
+                        values = self._parse_binary_frame(frame)
+                        if values is None:  # Bad checksum: skip this sync marker and resynchronize
+                            del rx_buffer[:sync + 1]
+                            continue
+                        del rx_buffer[:sync + self._frame_size]
+                        lines.append((frame, values))  # Queued with the lines below, keeping the samples in arrival order
+                        continue
+                        #endregion
+                    if i == -1:
+                        break
+                    lines.append(bytes(rx_buffer[:i]))
+                    del rx_buffer[:i+1]
+            else:
+                # Split off every complete line in one C-level call instead of a find/slice/del per line
+                end = rx_buffer.rfind(b'\n') + 1
+                lines = bytes(rx_buffer[:end]).split(b'\n')
+                del rx_buffer[:end]
+            for line in lines:
+                if isinstance(line, tuple):  # Binary frame, already decoded
+                    frame, payload = line
+                    line = frame.hex().encode('ascii')
+                else:
+                    payload = line = line.strip()
+                    if not line:
+                        continue
+                try:
+                    self._raw_q.put_nowait((time.monotonic() - self.start_time, payload))
+                except queue.Full:  # Parsing fell behind: drop the sample rather than stall the port
+                    dropped += 1
+                raw_lines.append(line)
+            if dropped:
+                self._rxq.put((None, None, None, f"Dropped {dropped} received packets, parsing fell behind"))
+            if raw_lines and not self.serial_connected.is_set():  # set() takes the Event's lock, is_set() does not
+                self.serial_connected.set()
+            now = time.monotonic()
+            try:
+                if raw_lines:
+                    raw_lines.append(b'')
+                    self._raw_fh.write(b'\n'.join(raw_lines))
+                    raw_error = None
+                if now - last_flush >= 1:  # The 64 KiB buffer otherwise holds minutes of slow data
+                    self._raw_fh.flush()
+                    last_flush = now
+            except OSError as err:  # A file error, not a disconnect: report it once and keep reading the port
+                if raw_error is None:
+                    self._rxq.put((None, None, None, f"Could not write raw serial data: {err}"))
+                raw_error = err
+            if len(rx_buffer) > MAX_PENDING_BYTES:  # No line ending in sight (wrong baud rate or binary noise)
+                self._rxq.put((None, None, None, f"Discarded {len(rx_buffer)} received bytes without a line ending"))
+                rx_buffer.clear()
+
+    def _reconnect(self):
+        '''Reopens the serial port after a disconnect, backing off exponentially up to 2 s and giving up on exit.'''
+        self.serial_connected.clear()  # Cleared before closing, so the Tk thread stops writing setpoints first
+        delay = 0.1
+        while not self.exit_signal.wait(delay):
+            try:
+                self.ser.close()
+                # A single reference swap, made only once the new port is open: other threads see either port, never a half-opened one
+                self.ser = self._open_serial()
+                self.serial_connected.set()
+                return
+            except (OSError, AttributeError):
+                delay = min(delay*2, 2.0)
+
+    def _parse_lines(self):
+        '''Parses the lines queued by _read_serial into channel values for _drain, off both the reader and the Tk loop.'''
+        failed, first_error = 0, None  # Unparseable packets since the last summary, logged at most once a second
+        last_report = float('-inf')
+        while True:
+            try:
+                item = self._raw_q.get(timeout=1)
+            except queue.Empty:
+                item = ()  # Nothing received: still report pending failures
+            if item is None:
+                break
+            if item:
+                run_duration, line = item
+                if isinstance(line, bytes):
+                    values, esp32_setpoints, ser_log = self._parse_serial_data(line.decode('utf-8', errors='replace'))
+                    if values is None:
+                        failed += 1
+                        first_error = first_error or ser_log
+                    else:
+                        self._rxq.put((run_duration, values, esp32_setpoints, ser_log))
+                else:  # Values of a binary frame, decoded by _read_serial
+                    self._rxq.put((run_duration, line, None, ''))
+            if failed and time.monotonic() - last_report >= 1:
+                self._rxq.put((None, None, None, self._parse_failure_summary(failed, first_error)))
+                failed, first_error = 0, None
+                last_report = time.monotonic()
+        if failed:
+            self._rxq.put((None, None, None, self._parse_failure_summary(failed, first_error)))
+
+    @staticmethod
+    def _parse_failure_summary(failed, first_error):
+        '''Log entry for a run of packets _parse_serial_data rejected.'''
+        return first_error if failed == 1 else f"{failed} packets could not be parsed, first: {first_error}"
 
     def _parse_serial_data(self, serial_data, delimiter="~~~"):
+        '''Splits a packet into (channel values in mc_data_dict order, ESP32 setpoints, log), or (None, None, error text).'''
         try:
             data, setpoints, log = serial_data.split(delimiter, 2)
-            parsed_data = ast.literal_eval(data)
-            parsed_data = {int(k): float(v) for k, v in parsed_data.items()}
-            parsed_setpoints = ast.literal_eval(setpoints)
-            return parsed_data, parsed_setpoints, log
-
+            # JSON (C parser) first, read through the string keys without rebuilding the dict,
+            # then Python dict literals via _parse_kv, then the general (slow) ast parser
+            try:
+                parsed_data = json.loads(data)
+                values = [float(parsed_data[k]) for k in self._ch_strkeys]
+            except json.JSONDecodeError:
+                try:
+                    parsed_data = self._parse_kv(data, int)
+                except ValueError:
+                    parsed_data = {int(k): float(v) for k, v in ast.literal_eval(data).items()}
+                values = self._get_channels(parsed_data)
+            try:
+                parsed_setpoints = json.loads(setpoints)
+            except json.JSONDecodeError:
+                try:
+                    parsed_setpoints = self._parse_kv(setpoints, str, allow_none=True)
+                except ValueError:
+                    parsed_setpoints = ast.literal_eval(setpoints)
+            if not isinstance(parsed_setpoints, dict):  # Validated once here, so _update can rely on it
+                raise ValueError(f'Setpoints are not a dict: {setpoints}')
+            return values, parsed_setpoints, log
+
+        except KeyError as e:
+            return None, None, f'Missing channel {e} in packet: {serial_data.strip()}'
         except Exception as e:
             error_text = f'Unexpected Error: {e}'
             return None, None, error_text
 
+    @staticmethod
+    def _parse_kv(text, key_type, allow_none=False):
+        """
+        Fast parser for the flat dicts sent by the ESP32, e.g. "{0: 1.5, 1: 2}" or "{'0': 1.5, '1': None}".
+        Args:
+            text (str): Dict literal whose values are numbers (or None/null if allow_none).
+            key_type (type): Type the (unquoted) keys are converted to.
+            allow_none (bool): Accept None/null values (unreported setpoints). Data packets never allow them.
+        Raises:
+            ValueError: If the text is not such a dict.
+        """
+        body = text.strip()
+        if body[:1] != '{' or body[-1:] != '}':
+            raise ValueError(f'Not a dict: {text}')
+        body = body[1:-1]
+        parsed = {}
+        if body.strip():
+            for item in body.split(','):
+                k, v = item.split(':')
+                v = v.strip()
+                parsed[key_type(k.strip().strip('\'"'))] = None if allow_none and v in ('None', 'null') else float(v)
+        return parsed
+
+    @staticmethod
+    def _parse_binary_frame(frame):
+        """
+        Decodes a binary data frame: FRAME_SYNC, one little-endian float32 per channel (mc_data_dict order),
+        then a checksum byte equal to the sum of the value bytes modulo 256.
+        Returns:
+            np.ndarray: Channel values, or None if the checksum does not match.
+        """
+        payload = frame[len(FRAME_SYNC):-1]
+        if sum(payload) & 0xFF != frame[-1]:
+            return None
+        return np.frombuffer(payload, dtype='<f4')
+
     def _send_setpoints(self):
-        # Translate setpoint names to their integer mappings
-        integer_setpoints = {self._setpoint_mapping[k]: v for k, v in self.setpoints.items()}
-        setpoint_json = json.dumps(integer_setpoints).encode('utf-8') + b'\n'
-        self.ser.write(setpoint_json)
-        return setpoint_json  # Return the JSON string for logging
-
-    def _save_files(self):
-        time_seconds = time.time()
-        current_time = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time_seconds))
-        self.log.append(f'Saved data at {current_time}')
-
-        data = {'Time':self.time_data}
-        for k,v in self.mc_data_dict.items():
-            data[v] = self.data_channels[k]
-        df = pd.DataFrame(data)
-
-        df.to_csv(self.datafilepath, index=False)
-        with open(self.logfilepath, 'w', encoding='utf8') as f:
-            for entry in self.log:
-                f.write(f"{entry}\n")
-        self.last_save_time = time_seconds
-
-    def _update(self): # NEW
+        if self._setpoint_json is None:
+            # Translate setpoint names to their integer mappings
+            integer_setpoints = {self._setpoint_mapping[k]: v for k, v in self.setpoints.items()}
+            self._setpoint_json = json.dumps(integer_setpoints).encode('utf-8') + b'\n'
+        self.ser.write(self._setpoint_json)
+        return self._setpoint_json  # Return the JSON string for logging
+
+    def _save_files(self, now):
+        '''Queues the rows collected since the last save for _write_data. now is the time.monotonic() of the call.'''
+        self.last_save_time = now
+        if self._save_error is not None:  # _write_data has stopped; the error is already logged and shown
+            return
+        self._log_write(f'Saved data at {self._now_str()}')
+
+        # Append only the rows collected since the last save
+        n = self._n
+        if n - self._rows_saved > RING_CAPACITY:
+            self._log_write(f'Lost {n - self._rows_saved - RING_CAPACITY} samples overwritten before they were saved')
+            self._rows_saved = n - RING_CAPACITY
+        t, channels = self._window(self._rows_saved, n)
+        self._save_q.put((t.copy(), channels.copy()))  # Copies: the ring keeps being written while _write_data runs
+        self._rows_saved = n
+        self._log_fh.flush()
+
+    def _write_data(self):
+        '''Writes the batches queued by _save_files to the data file, keeping formatting and disk I/O off the Tk loop.'''
         try:
-            with self.lock:
-                ser_data = self.serial_data_packet
-            ser_data, esp32_setpoints, ser_log = self._parse_serial_data(ser_data)
-
-            # Process the serial data
-            for k in self.mc_data_dict.keys():
-                self.data_channels[k].append(ser_data[k])
+            while (batch := self._save_q.get()) is not None:
+                t, channels = batch
+                if self._feather_writer:
+                    self._feather_writer.write_batch(pa.record_batch([t, *channels], names=['Time', *self.mc_data_dict.values()]))
+                else:
+                    # repr() keeps full precision in the shortest form; np.savetxt is no faster and needs %.17g for the same precision
+                    rows = np.vstack((t, channels)).T.tolist()
+                    self._csv_fh.write(''.join(','.join(map(repr, row)) + '\n' for row in rows))
+                    self._csv_fh.flush()
+        except OSError as err:  # e.g. disk full (pyarrow's IO errors are OSErrors too)
+            self._save_error = err
+            self._rxq.put((None, None, None, f"Could not write data: {err}"))
+
+    def _drain(self):
+        '''Runs _drain_rxq every 20 ms on the Tk loop. Does no drawing.'''
+        try:
+            self._drain_rxq()
+        finally:
+            self.root.after(20, self._drain)
 
-            run_duration = time.time() - self.start_time
-            self.time_data.append(run_duration)
+    def _drain_rxq(self):
+        '''Moves every packet parsed by _parse_lines into the sample buffers.'''
+        while True:
+            try:
+                run_duration, values, esp32_setpoints, ser_log = self._rxq.get_nowait()
+            except queue.Empty:
+                break
+            if values is not None:
+                self._append(run_duration, values)
+            if esp32_setpoints is not None:  # Binary frames carry no setpoints
+                self._esp32_setpoints = esp32_setpoints
+            if ser_log:
+                self._log_write(f"{ser_log} - {self._now_str()}")
+
+    def _redraw(self):
+        '''Blits the latest window of samples, or requests a full redraw if the axis limits changed.'''
+        n = self._n
+        start_idx = max(0, n - self.window_size)
+        n_out = max(800, int(self.ax.bbox.width*2))  # Points beyond ~2x the axes pixel width are invisible
+        t_window, y_window = self._window(start_idx, n)
+        self.line_collection.set_segments([np.column_stack(self._downsample(t_window, y, n_out)) for y in y_window])
+        rescaled = n > start_idx and self._rescale(t_window, y_window)
+        if rescaled or self.bg is None:
+            self.canvas.draw_idle()  # Axis limits changed: full redraw, background re-captured in _on_draw
+        else:
+            self.canvas.restore_region(self.bg)
+            self.ax.draw_artist(self.line_collection)
+            self.canvas.blit(self.ax.bbox)
+        self._n_plotted = (n, self.window_size)
+
+    def _rescale(self, t_window, y_window):
+        '''Moves the axis limits, with headroom, only when the data overflows them or fills less than half. Returns True if they changed.'''
+        rescaled = False
+        (x_lo, x_hi), (y_lo, y_hi) = self.ax.get_xlim(), self.ax.get_ylim()
+        t0, t1 = t_window[0], t_window[-1]
+        span = (t1 - t0) or 1.0
+        if t0 < x_lo or t1 > x_hi or x_hi - x_lo > 2.5*span:
+            self.ax.set_xlim(t0, t0 + 1.25*span)  # 25% headroom ahead of the newest sample
+            rescaled = True
+        finite = y_window[np.isfinite(y_window)]
+        if finite.size:
+            y0, y1 = finite.min(), finite.max()
+            pad = 0.1*(y1 - y0) or 0.5*abs(y0) or 0.5  # Flat signals still get some room
+            if y0 < y_lo or y1 > y_hi or y_hi - y_lo > 2*(y1 - y0 + 2*pad):
+                self.ax.set_ylim(y0 - pad, y1 + pad)
+                rescaled = True
+        return rescaled
+
+    def _update(self):
+        '''Redraws the plot, saves, checks setpoints, and refreshes the status at update_delay_seconds.'''
+        try:
+            now = time.monotonic()  # Read once per tick; timestamps for log lines come from _now_str only when one is written
 
             #region Plotting
             try:
-                self.window_size = int(self.window_size_entry.get())
+                self.window_size = min(int(self.window_size_entry.get()), RING_CAPACITY)
             except ValueError:
                 self.window_size = 200  # Default to 200 if invalid input
-            start_idx = max(0, len(self.time_data) - self.window_size)
-
-            self.ax.clear()
-            self.ax.set_title(self.graph_title)
-            self.ax.set_xlabel('Time (s)')
-            self.ax.set_ylabel(self.graph_ylabel)
-            self.ax.minorticks_on()
-            for k in self.mc_data_dict.keys():
-                self.ax.plot(self.time_data[start_idx:], self.data_channels[k][start_idx:], label=self.mc_data_dict[k])
-            self.ax.grid(True, which='major', color='silver', linewidth=0.375, linestyle='-')
-            self.ax.grid(True, which='minor', color='lightgrey', linewidth=0.2, linestyle='--')
-            self.ax.legend(fontsize='small')
-            self.canvas.draw()
+            plot_error = None
+            # Skip the repaint if nothing changed, or if a short update_delay_seconds would exceed MAX_FPS
+            if self._n_plotted != (self._n, self.window_size) and now - self._last_paint >= 1/MAX_FPS:
+                try:
+                    self._redraw()
+                except Exception as err:  # Keep acquiring, saving and checking setpoints if Matplotlib/Tk fails
+                    plot_error = err
+                    self._log_write(f"Plotting error at {self._now_str()}: {err!r}")
+                self._last_paint = now
             #endregion
 
-            current_time = time.time()
-            stringtime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
-            if current_time - self.last_save_time >= 10:
-                self._save_files()
+            if now - self.last_save_time >= 10:
+                self._save_files(now)
 
-            # Update setpoints from the GUI entries
-            if self.setpoints:
-                for name, entry in self.setpoint_entries.items():
-                    try:
-                        self.setpoints[name] = round(float(entry.get()), self.setpoint_decimals)
-                    except TypeError: # Toggle buttons don't have .get
-                        self.setpoints[name] = entry['value']
-                    except ValueError:
-                        pass
+            # Update setpoints from the GUI entries edited since the last tick
+            while self._setpoints_dirty:
+                name = self._setpoints_dirty.pop()
+                try:
+                    self.setpoints[name] = round(float(self.setpoint_entries[name].get()), self.setpoint_decimals)
+                except ValueError:
+                    continue
+                self._sp_vals[self._setpoint_mapping[name]] = self.setpoints[name]
+                self._setpoint_json = None
 
             #region ESP32 setpoint check (resend if mismatched)
             matching_setpoints = True
-            for k, v in self.setpoints.items():
-                mapped_index = self._setpoint_mapping[k]
-                esp32_value = esp32_setpoints[str(mapped_index)]
-                if esp32_value is None:
-                    continue
-
-                if isinstance(v, str):
-                    err = 0  # Ignore string inputs
-                elif v > .000001:
-                    err = abs(esp32_value / v - 1)
-                else:
-                    err = abs(esp32_value - v)  # Use absolute error for very low values
-
-                if err > self.setpoint_check_precision:
+            esp32_setpoints = self._esp32_setpoints
+            if esp32_setpoints and self._sp_names:
+                # None (unreported) becomes NaN, and NaN errors never count as mismatches
+                reported = [esp32_setpoints.get(k) for k in self._sp_strkeys]
+                try:
+                    reported = np.array(reported, dtype=np.float64)
+                except (TypeError, ValueError):  # Non-numeric (string) setpoints are not checked either
+                    reported = np.array([v if isinstance(v, (int, float)) else np.nan for v in reported], dtype=np.float64)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    # Relative error, or absolute error for very low values
+                    errors = np.where(self._sp_vals > .000001, np.abs(reported / self._sp_vals - 1), np.abs(reported - self._sp_vals))
+                mismatched = np.flatnonzero(errors > self.setpoint_check_precision)
+                if mismatched.size:
                     matching_setpoints = False
-                    self.log.append(f'Setpoint mismatch detected at {stringtime}: {k} [{self._setpoint_mapping[k]}]:{v} in SimpleDAQ vs {mapped_index}:{esp32_value} on ESP32')
-                    break
+                    mapped_index = mismatched[0]
+                    k = self._sp_names[mapped_index]
+                    self._log_write(f'Setpoint mismatch detected at {self._now_str()}: {k} [{mapped_index}]:{self.setpoints[k]} in SimpleDAQ vs {mapped_index}:{esp32_setpoints.get(self._sp_strkeys[mapped_index])} on ESP32')
 
             if not matching_setpoints:
-                with self.lock:
-                    if self.serial_connected:
+                if self.serial_connected.is_set():
+                    try:
                         setpoint_json = self._send_setpoints()  # Send setpoints over USB serial and capture the JSON
-                        self.log.append(f'Passed new setpoints at {stringtime}: {str(setpoint_json).strip()}')
+                        self._log_write(f'Passed new setpoints at {self._now_str()}: {str(setpoint_json).strip()}')
+                    except serial.SerialException as err:  # Port lost since the check; _read_serial reconnects
+                        self._log_write(f'Could not send setpoints at {self._now_str()}: {err}')
             #endregion
 
             #region ESP32 serial connection status
-            with self.lock:
-                if self.serial_connected:
-                    self.status_label.config(text=f"USB Port: {self.ser.port}\nStatus: Connected", fg='green', font=("Helvetica", 12, "bold"))
-                else:
-                    self.status_label.config(text="USB Port: Unknown\nStatus: Disconnected", fg='red', font=("Helvetica", 12, "bold"))
-                    self.log.append(f"Serial port disconnected at {stringtime}")
-            if ser_log:
-                self.log.append(f"{ser_log} - {stringtime}")
+            if plot_error is not None:
+                self._set_status(f"Plotting error:\n{type(plot_error).__name__}", 'red')
+            elif self._save_error is not None:
+                self._set_status(f"Save error:\n{type(self._save_error).__name__}", 'red')
+            elif self.serial_connected.is_set():
+                self._set_status(f"USB Port: {self.ser.port}\nStatus: Connected", 'green')
+            else:
+                self._set_status("USB Port: Unknown\nStatus: Disconnected", 'red')
+                self._log_write(f"Serial port disconnected at {self._now_str()}")
             #endregion
 
-        except Exception as err:
-            self.status_label.config(text="Unhandled Exception", fg='red', font=("Helvetica", 12, "bold"))
-            self.log.append(f"Unhandled error: {err}. Serial log: {str(ser_log)}")
-
-        finally:
+        finally:  # Anything unexpected is reported by Tk, and the update loop keeps running
             self.root.after(int(1000*self.update_delay_seconds), self._update)
 
+    def _now_str(self):
+        '''Returns the local time as a log timestamp, formatting it at most once per second.'''
+        s = int(time.time())
+        if s != self._ts_sec:
+            self._ts_sec = s
+            self._ts_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(s))
+        return self._ts_str
+
+    def _set_status(self, text, color):
+        '''Reconfigures the status label only when its text or colour changes, sparing Tk a redraw every tick.'''
+        if (text, color) != self._last_status:
+            self.status_label.config(text=text, fg=color)
+            self._last_status = (text, color)
+
     def _exit_program(self):
         self.exit_signal.set()
         self.serial_thread.join()
-        self.log.append(f"Program exited at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time()))}")
-        with open(self.logfilepath, 'w', encoding='utf8') as f:
-            for entry in self.log:
-                f.write(f"{entry}\n")
+        self._raw_q.put(None)
+        self.parse_thread.join()
+        self._drain_rxq()  # Packets parsed since the last _drain tick would otherwise miss the final save
+        self._save_files(time.monotonic())
+        self._save_q.put(None)
+        self.save_thread.join()
+        try:
+            if self._feather_writer:
+                self._feather_writer.close()
+            else:
+                self._csv_fh.close()
+        except OSError as err:  # Buffered rows that could not be written; the ports and GUI still get closed
+            self._log_write(f"Could not write data: {err}")
+        self._drain_rxq()  # Logs a write error reported by _write_data
+        self._log_write(f"Program exited at {self._now_str()}")
+        self._log_fh.close()
+        self._raw_fh.close()
         self.ser.close()
         self.root.quit()
         self.root.destroy()